@@ -1,68 +1,152 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import functools
+import os
 import re
+from collections.abc import Iterator
 from pathlib import Path
+import shutil
 import subprocess
+import sys
 from tempfile import NamedTemporaryFile
+from typing import TextIO
 
 FILE_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx")
 
+# Leading whitespace may not span lines and an import clause stops at the next
+# import line, so each match only scans its own statement and findall() stays
+# linear even on files full of unterminated imports.
+_IMPORT_RE = re.compile(
+    rb"^[^\S\n]*(?:import(?:[\s,{](?:(?!\n[^\S\n]*import[\s,{(])[\w*{}\s,])*?)?\sfrom\s|import\()"
+    rb"""\s*['"]([^'"]+)['"]""",
+    re.MULTILINE,
+)
+
+# Characters that are not allowed in Mermaid node ids
+_SANITIZE_TABLE = str.maketrans(dict.fromkeys("./-[]", "_"))
+
+# Normalized paths of the regular files seen so far, and the (normalized)
+# directories whose files have all been recorded in it
+_known_files: set[str] = set()
+_indexed_dirs: set[str] = set()
 
-def extract_imports(file_content: str) -> list[str]:
-    """Extract dependencies from file content."""
-    pattern = re.compile(
-        r'^\s*(?!//)(?:import(?:[\s,{]+[\w*{}\s,]*?)?\sfrom\s|import\()\s*[\'"]([^\'"]+)[\'"]',
-        re.MULTILINE,
-    )
-    return pattern.findall(file_content)
 
+def extract_imports(file_content: bytes) -> list[str]:
+    """Extract dependencies from raw file content."""
+    if b"import" not in file_content:
+        return []  # Cheap substring check before running the regex
+    return [m.decode("utf-8", errors="replace") for m in _IMPORT_RE.findall(file_content)]
 
-def resolve_path(import_path: str, current_file: Path, root: Path) -> Path | None:
+
+def resolve_path(import_path: str, current_file: str, root: str) -> str | None:
     """Resolve import path relative to current file or src root."""
     if import_path.startswith("."):
-        base = current_file.parent
+        base = os.path.dirname(current_file)
     elif import_path.startswith("@/"):
-        base = root / "src"
+        base = os.path.join(root, "src")
         import_path = import_path[2:]  # Remove the "@/"
     else:
-        base = root / "src"  # Default to src for non-relative, non-aliased imports
+        base = os.path.join(root, "src")  # Default to src for non-relative, non-aliased imports
+
+    return _resolve_cached(import_path, base)
 
+
+@functools.lru_cache(maxsize=None)
+def _resolve_cached(import_path: str, base: str) -> str | None:
+    """Find the file an import points to from base; memoized per (import, base)."""
     potential_paths = [
-        base / import_path,
-        *(base / f"{import_path}{ext}" for ext in FILE_EXTENSIONS),
-        *(base / import_path / f"index{ext}" for ext in FILE_EXTENSIONS),
+        os.path.join(base, import_path),
+        *(os.path.join(base, f"{import_path}{ext}") for ext in FILE_EXTENSIONS),
+        *(os.path.join(base, import_path, f"index{ext}") for ext in FILE_EXTENSIONS),
     ]
     for path in potential_paths:
-        if path.is_file():
-            return path.resolve()
+        path = os.path.normpath(path)
+        if _is_file(path):
+            return os.path.realpath(path)
     return None
 
 
+def _is_file(path: str) -> bool:
+    """Look a normalized path up in the known files, listing its directory if the walk did not."""
+    if path in _known_files:
+        return True
+    directory = os.path.dirname(path)
+    if directory in _indexed_dirs:
+        return False
+    _indexed_dirs.add(directory)
+    try:
+        with os.scandir(directory or os.curdir) as entries:
+            _known_files.update(os.path.normpath(e.path) for e in entries if e.is_file())
+    except OSError:
+        return False
+    return path in _known_files
+
+
+def _walk(root: str, exts: tuple[str, ...]) -> Iterator[tuple[str, str]]:
+    """Yield (path, relative path) for source files under root, skipping node_modules.
+
+    Every regular file seen along the way is recorded in _known_files for the resolver.
+    """
+    stack = [(root, "")]
+    while stack:
+        directory, rel_dir = stack.pop()
+        _indexed_dirs.add(os.path.normpath(directory))
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue  # Unreadable or removed mid-walk; Path.rglob skipped these too
+        with entries:
+            for entry in entries:
+                if entry.name == "node_modules":
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, f"{rel_dir}{entry.name}{os.sep}"))
+                elif entry.is_file():
+                    _known_files.add(os.path.normpath(entry.path))
+                    if entry.name.endswith(exts):
+                        yield entry.path, sys.intern(rel_dir + entry.name)
+
+
+def _read_and_extract(path: str) -> list[str]:
+    """Read a source file and extract its imports."""
+    with open(path, "rb") as f:
+        return extract_imports(f.read())
+
+
 def build_dependency_graph(
     project_root: Path,
     blacklist: list[str],
 ) -> dict[str, list[str]]:
     """Create a dependency graph, excluding blacklisted files."""
-    graph = {}
-    files = [
-        f
-        for f in project_root.rglob("*")
-        if f.is_file() and f.suffix in FILE_EXTENSIONS and "node_modules" not in f.parts
-    ]
+    # Files may have changed since a previous run
+    _resolve_cached.cache_clear()
+    _known_files.clear()
+    _indexed_dirs.clear()
 
-    for file_path in files:
-        rel_file = str(file_path.relative_to(project_root))
+    root = os.fspath(project_root)
+    # Resolved imports are real paths, so compare them against the real root
+    root_prefix = os.path.join(os.path.realpath(root), "")
 
+    graph = {}
+    files = [
+        (path, rel_file)
+        for path, rel_file in _walk(root, FILE_EXTENSIONS)
         # --- Blacklist Check (File Level) ---
-        if rel_file in blacklist:
-            continue  # Skip this file entirely
+        if rel_file not in blacklist
+    ]
 
-        imports = extract_imports(file_path.read_text("utf-8"))
+    # File reads release the GIL, so overlap them; resolution below stays
+    # single-threaded because it fills the shared caches.
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        all_imports = list(executor.map(_read_and_extract, (path for path, _ in files)))
 
+    for (path, rel_file), imports in zip(files, all_imports):
         resolved_imports = []
-        for imp in imports:
-            imp_path = resolve_path(imp, file_path, project_root)
-            if imp_path and project_root in imp_path.parents:
-                resolved_import_path = str(imp_path.relative_to(project_root))
+        for imp in dict.fromkeys(imports):  # Resolve repeated specifiers once
+            imp_path = resolve_path(imp, path, root)
+            if imp_path and imp_path.startswith(root_prefix):
+                resolved_import_path = sys.intern(imp_path[len(root_prefix) :])
 
                 # --- Blacklist Check (Dependency Level) ---
                 if resolved_import_path not in blacklist:
@@ -72,48 +156,70 @@ def build_dependency_graph(
     return graph
 
 
-def to_mermaid(graph: dict[str, list[str]]) -> str:
-    """Convert dependency graph to Mermaid format."""
+def write_mermaid(graph: dict[str, list[str]], fp: TextIO) -> None:
+    """Write dependency graph to fp in Mermaid format, one edge at a time."""
+
+    sanitized: dict[str, str] = {}
 
     def sanitize(s: str) -> str:
-        return (
-            s.replace(".", "_")
-            .replace("/", "_")
-            .replace("-", "_")
-            .replace("[", "_")
-            .replace("]", "_")
-        )
-
-    lines = ["graph LR"]
+        if (node_id := sanitized.get(s)) is None:
+            node_id = sanitized[s] = s.translate(_SANITIZE_TABLE)
+        return node_id
+
+    fp.write("graph LR\n")
     for src, targets in graph.items():
+        if not targets:
+            continue
+        src_node = f'    {sanitize(src)}["{src}"] --> '
         for tgt in targets:
-            lines.append(f'    {sanitize(src)}["{src}"] --> {sanitize(tgt)}["{tgt}"]')
-    return "\n".join(lines)
-
-
-def save_to(content: str, path: Path) -> None:
-    with NamedTemporaryFile("w") as mmd, NamedTemporaryFile("w") as config:
-        mmd.write(content)
-        mmd.flush()
-
+            fp.write(f'{src_node}{sanitize(tgt)}["{tgt}"]\n')
+
+
+@functools.lru_cache(maxsize=None)
+def _mmdc_command() -> tuple[str, ...]:
+    """Locate mermaid-cli once, preferring an installed mmdc over npx."""
+    if mmdc := shutil.which("mmdc"):
+        return (mmdc,)
+    try:
+        npm_root = subprocess.check_output(["npm", "root", "-g"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        npm_root = ""
+    cli = Path(npm_root, "@mermaid-js", "mermaid-cli", "src", "cli.js")
+    if npm_root and cli.is_file() and (node := shutil.which("node")):
+        return (node, str(cli))
+    # Not installed anywhere: let npx fetch it (slow, but only the first time)
+    return ("npx", "-y", "-p", "@mermaid-js/mermaid-cli", "mmdc")
+
+
+def save_to(graph: dict[str, list[str]], path: Path) -> int:
+    """Render graph to path with mmdc and return its exit code."""
+    with NamedTemporaryFile("w") as config:
         config.write('{"maxTextSize": 1000000000, "maxEdges": 1000000000}')
         config.flush()
 
-        subprocess.run(
+        # The diagram is streamed through stdin, so only the config needs a file
+        with subprocess.Popen(
             [
-                "npx",
-                "-y",
-                "-p",
-                "@mermaid-js/mermaid-cli",
-                "mmdc",
+                *_mmdc_command(),
                 "-i",
-                mmd.name,
+                "-",
                 "-o",
                 str(path),
                 "-c",
                 config.name,
-            ]
-        )
+            ],
+            stdin=subprocess.PIPE,
+            encoding="utf-8",
+        ) as proc:
+            try:
+                write_mermaid(graph, proc.stdin)
+                proc.stdin.close()
+            except BrokenPipeError:
+                # mmdc exited before reading everything and reports why itself;
+                # close again to drop the unsent buffer before Popen waits on it
+                with contextlib.suppress(BrokenPipeError):
+                    proc.stdin.close()
+    return proc.returncode
 
 
 def main():
@@ -131,11 +237,11 @@ def main():
 
     blacklist = args.blacklist.split(",") if args.blacklist else []
     graph = build_dependency_graph(args.project_path, blacklist)
-    output = to_mermaid(graph)
     if args.output:
-        save_to(output, args.output)
+        if returncode := save_to(graph, args.output):
+            sys.exit(f"mmdc failed with exit code {returncode}")
     else:
-        print(output)
+        write_mermaid(graph, sys.stdout)
 
 
 if __name__ == "__main__":
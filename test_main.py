@@ -0,0 +1,144 @@
+import os
+from pathlib import Path
+import random
+import re
+import timeit
+
+import pytest
+
+from main import build_dependency_graph, extract_imports
+
+# The import pattern as originally written, before it was made linear-time
+ORIGINAL_IMPORT_RE = re.compile(
+    rb'^\s*(?!//)(?:import(?:[\s,{]+[\w*{}\s,]*?)?\sfrom\s|import\()\s*[\'"]([^\'"]+)[\'"]',
+    re.MULTILINE,
+)
+
+TOKENS = [
+    b"import", b"from", b" ", b"\n", b"\t", b"\v", b"\r", b"'", b'"', b"{", b"}", b",",
+    b"*", b"a", b"x", b"(", b")", b";", b"//", b"./m", b"\xc3\xa9", b"fromx",
+    b"\nimport", b"\n import ",
+]
+
+
+def test_extract_imports():
+    content = b"""import React, { useState } from "react";
+import type { Props } from '@/types';
+import {
+  a,
+  b,
+} from "./multi";
+// import { skipped } from "./commented";
+const lazy = import("./not-at-line-start");
+import("./dynamic");
+import "./side-effect";
+"""
+    assert extract_imports(content) == ["react", "@/types", "./multi", "./dynamic"]
+
+
+def test_extract_imports_matches_original_pattern():
+    rng = random.Random(0)
+    for _ in range(50_000):
+        content = b"".join(rng.choice(TOKENS) for _ in range(rng.randint(0, 30)))
+        expected = [m.decode("utf-8", errors="replace") for m in ORIGINAL_IMPORT_RE.findall(content)]
+        assert extract_imports(content) == expected, content
+
+
+def _best_time(content: bytes) -> float:
+    return min(timeit.repeat(lambda: extract_imports(content), number=1, repeat=5))
+
+
+@pytest.mark.parametrize(
+    ("head", "line", "tail"),
+    [
+        (b"", b"import x\n", b""),
+        (b"", b"import a from b\n", b""),
+        (b"", b"import './polyfill.js'\n", b"import { a } from './a'\n"),
+        (b"", b'var a=1;import("x");', b""),
+        (b"import a\n", b"\n", b""),
+    ],
+)
+def test_extract_imports_is_linear(head, line, tail):
+    small = _best_time(head + line * 5_000 + tail)
+    large = _best_time(head + line * 20_000 + tail)
+    # 4x the input should take about 4x the time; quadratic matching takes 16x
+    assert large < 8 * small
+
+
+@pytest.fixture
+def project(tmp_path):
+    files = {
+        "src/index.ts": """import { helper } from "./utils/helpers";
+import type { Helper } from "./utils/helpers";
+import Button from "@/components/Button";
+import styles from "./style.css";
+import React from "react";
+import { pkg } from "../node_modules/pkg/main";
+""",
+        "src/utils/helpers.js": 'import { other } from "utils/other";\n',
+        "src/utils/other.ts": "export const other = 1;\n",
+        "src/components/Button/index.tsx": "export default function Button() {}\n",
+        "src/style.css": ".button {}\n",
+        "lib/entry.js": 'import { a } from "../linked/helpers";\nimport { b } from "../../outside";\n',
+        "node_modules/pkg/main.js": 'import { c } from "./dep";\n',
+    }
+    root = tmp_path / "project"
+    for name, content in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(content)
+    (root / "linked").symlink_to(root / "src" / "utils", target_is_directory=True)
+    (tmp_path / "outside.ts").write_text("export const b = 1;\n")
+    return root
+
+
+PROJECT_GRAPH = {
+    "src/index.ts": [
+        "src/utils/helpers.js",
+        "src/components/Button/index.tsx",
+        "src/style.css",
+        "node_modules/pkg/main.js",
+    ],
+    "src/utils/helpers.js": ["src/utils/other.ts"],
+    "src/utils/other.ts": [],
+    "src/components/Button/index.tsx": [],
+    "lib/entry.js": ["src/utils/helpers.js"],
+}
+
+
+def test_build_dependency_graph(project):
+    assert build_dependency_graph(project, []) == PROJECT_GRAPH
+
+
+def test_build_dependency_graph_relative_root(project, monkeypatch):
+    monkeypatch.chdir(project.parent)
+    assert build_dependency_graph(Path(project.name), []) == PROJECT_GRAPH
+
+
+def test_build_dependency_graph_blacklist(project):
+    graph = build_dependency_graph(project, ["lib/entry.js", "src/style.css"])
+    assert "lib/entry.js" not in graph
+    assert graph["src/index.ts"] == [
+        "src/utils/helpers.js",
+        "src/components/Button/index.tsx",
+        "node_modules/pkg/main.js",
+    ]
+
+
+def test_build_dependency_graph_skips_unreadable_directories(tmp_path, monkeypatch):
+    (tmp_path / "src" / "secret").mkdir(parents=True)
+    (tmp_path / "src" / "a.ts").write_text('import { b } from "./b";\n')
+    (tmp_path / "src" / "b.ts").write_text("export const b = 1;\n")
+
+    scandir = os.scandir
+    secret = str(tmp_path / "src" / "secret")
+
+    def unreadable_secret(path="."):
+        if os.fspath(path) == secret:
+            raise PermissionError(13, "Permission denied", secret)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", unreadable_secret)
+    assert build_dependency_graph(tmp_path, []) == {
+        "src/a.ts": ["src/b.ts"],
+        "src/b.ts": [],
+    }